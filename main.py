@@ -1,8 +1,15 @@
-from typing import Dict, List
-from enum import Enum, auto
+from typing import Dict, Iterator, Tuple, cast
+from enum import IntEnum, auto
 from pprint import pprint
+import re
 import sys
 
+# simdjson is optional, see fast_parse()
+try:
+    import simdjson  # type: ignore[import-not-found, unused-ignore]
+    HAS_SIMDJSON = True
+except ImportError:
+    HAS_SIMDJSON = False
 
 class LexException(Exception):
     pass
@@ -12,7 +19,25 @@ class ParseException(Exception):
     pass
 
 
-class TokenType(Enum):
+# The whole lexer, as one regex. Each match is exactly one token along with
+# any whitespace in front of it, and finditer() walks the source with it in
+# C, so Python only runs once per token instead of once per character. The
+# groups are, in order:
+#
+#   1. punctuation
+#   2. the contents of a string, without the quotes
+#   3. a number (\d would also accept non-ascii digits, hence [0-9])
+#   4. anything else, which is an error
+#
+# Folding the whitespace into the token saves a whole trip through the loop
+# in Lexer.tokens() per whitespace run. Group 4 can't be whitespace, otherwise
+# trailing whitespace would backtrack into it and be reported as an error.
+TOKEN = re.compile(r'[ \t\n\r]*(?:([{},:])|"([^"]*)"|([0-9]+)|([^ \t\n\r]))')
+
+
+# An IntEnum so the members are plain ints underneath, which makes comparing
+# against them just an int comparison.
+class TokenType(IntEnum):
     LSQUIRLY = auto()
     RSQUIRLY = auto()
     COMMA = auto()
@@ -22,192 +47,185 @@ class TokenType(Enum):
     EOF = auto()    # EOF just indicates the end of the token stream
 
 
-# Any discrete part of the language that can be considered a separate thing
-# in of itself. For example, it may be a keyword, an operator, or a string or
-# number, or punctuation like braces or semicolons.
-class Token:
-    def __init__(self, tok_type: TokenType, lexeme: str):
-        self.tok_type = tok_type
-        self.lexeme = lexeme
-
-    def __str__(self):
-        return f"({self.tok_type}, {self.lexeme})"
-
-    def __repr__(self):
-        return f"(type: {self.tok_type}, lexeme: {self.lexeme})"
-
-
-# The lexer takes the input string and from that, gives you a list of tokens.
+# The members again as plain globals. The lexer and parser compare against
+# these once per token, and a bare global is one lookup where TokenType.X is
+# a global lookup and then an attribute lookup on top.
+LSQUIRLY, RSQUIRLY, COMMA, COLON, STRING, NUMBER, EOF = (
+    TokenType.LSQUIRLY,
+    TokenType.RSQUIRLY,
+    TokenType.COMMA,
+    TokenType.COLON,
+    TokenType.STRING,
+    TokenType.NUMBER,
+    TokenType.EOF,
+)
+
+# What the punctuation tokens look like, for error messages.
+PUNCTUATION = {
+    TokenType.LSQUIRLY: "{",
+    TokenType.RSQUIRLY: "}",
+    TokenType.COMMA: ",",
+    TokenType.COLON: ":",
+}
+
+# And the other way around, so the lexer can turn one of those characters
+# into its token with a single lookup. The tokens are built once here and
+# handed out every time, since they're the same every time anyway, so
+# punctuation (about half of any json) doesn't allocate anything.
+SINGLE_CHAR_TOKENS = {
+    lexeme: (tok_type, lexeme) for tok_type, lexeme in PUNCTUATION.items()
+}
+
+# The token types that can be a value in a pair.
+VALUE_TYPES = frozenset((TokenType.STRING, TokenType.NUMBER))
+
+
+# The lexer takes the input string and from that, gives you the tokens.
+#
+# A token is any discrete part of the language that can be considered a
+# separate thing in of itself. For example, it may be a keyword, an operator,
+# or a string or number, or punctuation like braces or semicolons.
+#
+# Tokens are handed out one at a time as (type, lexeme) pairs, as the parser
+# asks for them, rather than all being built up front into a list. The parser
+# only ever looks at the current token, so there's no point keeping the rest
+# of them around.
 class Lexer:
     def __init__(self, source: str):
         self.source = source    # The string which we're forming tokens out of
-        self.i = 0      # The index in the source where the lexer's at currently
-        self.tokens: List[Token] = []
-        pass
-
-    # Check if a character is a digit.
-    def is_digit(self, char: str) -> bool:
-        return "0" <= char <= "9"
-
-    # Check if we've reached the end.
-    def is_at_end(self):
-        return self.i >= len(self.source)
-
-    def consume_whitespace(self):
-        while self.source[self.i] == " ":
-            self.i += 1
-
-    def make_token(self, tok_type: TokenType, lexeme: str):
-        self.tokens.append(Token(tok_type, lexeme))
-
-    def handle_string(self):
-        self.i += 1  # consume the "
-        key = ""
-
-        # grab the string content
-        while not self.is_at_end() and self.source[self.i] != "\"" :
-            key += self.source[self.i]
-            self.i += 1
-
-        if self.is_at_end():
-            raise LexException("Unterminated string")
-
-        self.i += 1     # consume the last "
-        self.make_token(TokenType.STRING, "\"" + key + "\"")
-
-    def handle_number(self):
-        key = ""
-        while self.is_digit(self.source[self.i]):
-            if self.is_at_end():
-                raise LexException("json input ended abruptly")
-
-            key += self.source[self.i]
-            self.i += 1
-
-        self.make_token(TokenType.NUMBER, key)
-
-    def consume(self):
-        self.consume_whitespace()
-
-        char = self.source[self.i]
-        match char:
-            case "{":
-                self.make_token(TokenType.LSQUIRLY, "{")
-                self.i += 1
-            case "}":
-                self.make_token(TokenType.RSQUIRLY, "}")
-                self.i += 1
-            case ",":
-                self.make_token(TokenType.COMMA, ",")
-                self.i += 1
-            case ":":
-                self.make_token(TokenType.COLON, ":")
-                self.i += 1
-            case "\"":
-                self.handle_string()
-            case _ if self.is_digit(char):
-                self.handle_number()
-            case _:
-                raise LexException(f"Unexpected character: {char}")
-
-    def lex(self) -> List[Token]:
-        while self.i < len(self.source):
-            self.consume()
-
-        self.make_token(TokenType.EOF, "")
-
-        return self.tokens
-
 
+    def tokens(self) -> Iterator[Tuple[TokenType, str | int]]:
+        # Pull everything the loop touches into locals first. This loop runs
+        # once per token, and a local is a lot cheaper to look up than a
+        # global or an attribute on one.
+        single_char_tokens = SINGLE_CHAR_TOKENS
+        string_type = STRING
+        number_type = NUMBER
+
+        for m in TOKEN.finditer(self.source):
+            # Every match fills in exactly one group, and lastindex says
+            # which. Switching on that int is cheaper than unpacking all four
+            # groups and checking each one for None.
+            kind = m.lastindex
+
+            if kind == 1:
+                yield single_char_tokens[m[1]]
+            elif kind == 2:
+                yield string_type, m[2]
+            elif kind == 3:
+                number = m[3]
+
+                # Numbers are only ever digits, so they're always ints.
+                # Parse them once here and the parser can use them as is.
+                try:
+                    value = int(number)
+                except ValueError:
+                    # int() refuses to convert absurdly long digit strings
+                    raise LexException(f"Number too long: {number[:16]}...")
+
+                yield number_type, value
+            else:
+                other = m[4]
+
+                # A " only ends up here if there's no closing " after it
+                if other == "\"":
+                    raise LexException("Unterminated string")
+
+                raise LexException(f"Unexpected character: {other}")
+
+        yield EOF, ""
+
+
+# The parser pulls tokens from the lexer as it goes, so lexing and parsing
+# happen in the same pass. That also means a lexer error can come out of any
+# of these methods, not just parse errors.
 class Parser:
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: Iterator[Tuple[TokenType, str | int]]):
         self.tokens = tokens
-        self.i = 0
-        self.result: Dict[str, str | float] = {}
-
-    def consume(self, expected: str):
-        if self.is_at_end():
-            raise ParseException("json input ended without \"}\"")
-
-        found = self.curr().lexeme
-        if found != expected:
-            raise ParseException(f"Expected {expected} but got {found}")
-
-        self.i += 1
-
-    def match(self, expected: str) -> bool:
-        if self.is_at_end():
-            raise ParseException("json input ended without \"}\"")
 
-        found = self.curr().lexeme
-        if found != expected:
+        # The current token. Filled in by advance() once parsing starts.
+        self.tok_type = EOF
+        self.lexeme: str | int = ""
+
+        self.result: Dict[str, str | int] = {}
+
+    # Move on to the next token. This is never called once we're sitting on
+    # EOF, since nothing accepts EOF as a token to step over.
+    def advance(self) -> None:
+        self.tok_type, self.lexeme = next(self.tokens)
+
+    # These two run once per punctuation token, so they skip is_at_end().
+    # The EOF token at the end of the stream never matches anything we
+    # expect, so hitting the end just looks like a mismatch, and we only
+    # check for it once we already know something's wrong.
+    def consume(self, expected: TokenType) -> None:
+        tok_type = self.tok_type
+        if tok_type != expected:
+            if tok_type == EOF:
+                raise ParseException("json input ended without \"}\"")
+
+            found = self.lexeme
+            if tok_type == STRING:
+                found = f"\"{found}\""
+            raise ParseException(
+                f"Expected {PUNCTUATION[expected]} but got {found}")
+
+        self.advance()
+
+    def match(self, expected: TokenType) -> bool:
+        if self.tok_type != expected:
             return False
 
-        self.i += 1
+        self.advance()
         return True
 
     def is_at_end(self) -> bool:
-        return self.curr().tok_type == TokenType.EOF
-
-    def curr(self) -> Token:
-        return self.tokens[self.i]
-
-    def next(self) -> Token | None:
-        if self.is_at_end():
-            return None
-
-        return self.tokens[self.i + 1]
+        return self.tok_type == EOF
 
     def key(self) -> str:
-        if self.is_at_end():
-            raise ParseException("Expected string")
-
-        curr = self.curr()
-
         # In json, only strings can be keys
-        if curr.tok_type != TokenType.STRING:
+        if self.tok_type != STRING:
             raise ParseException("Expected string")
 
-        key = curr.lexeme[1:-1]
-        self.i += 1
+        # the check above means this is a str, cast() just tells the
+        # type checker (and mypyc) as much
+        key = cast(str, self.lexeme)
+        self.advance()
         return key
 
-    def value(self):
-        if self.is_at_end():
-            raise ParseException("Expected a value for the corresponding key")
-
-        value = 0
-        curr = self.curr()
+    def value(self) -> str | int:
+        # For now, only strings and numbers are supported by the parser.
+        # The lexer already stores both ready to use, so there's nothing to
+        # dispatch on, just whether the type is one of them.
+        tok_type = self.tok_type
+        if tok_type not in VALUE_TYPES:
+            if tok_type == EOF:
+                raise ParseException(
+                    "Expected a value for the corresponding key")
 
-        # For now, only strings and numbers are supported by the parser
-        match curr.tok_type:
-            case TokenType.STRING:
-                value = curr.lexeme[1:-1]
-            case TokenType.NUMBER:
-                value = float(curr.lexeme)
-            case _:
-                raise ParseException("Expected string or number")
+            raise ParseException("Expected string or number")
 
-        self.i += 1
+        value = self.lexeme
+        self.advance()
         return value
 
-    def pair(self):
+    def pair(self) -> None:
         key = self.key()
-        self.consume(":")
+        self.consume(COLON)
         value = self.value()
 
         # After grabbing the key and value, set it in the result dict
         self.result[key] = value
 
-    def json(self):
+    def json(self) -> None:
         # Accept empty strings
         if self.is_at_end():
             return
 
-        self.consume("{")
+        self.consume(LSQUIRLY)
 
         # Accept {}
-        if self.match("}"):
+        if self.match(RSQUIRLY):
             return
 
         # The structure of the while loop disallows trailing commas.
@@ -215,38 +233,75 @@ class Parser:
         while not self.is_at_end():
             self.pair()
 
-            if self.match("}"):
+            if self.match(RSQUIRLY):
                 return
 
-            self.consume(",")
+            self.consume(COMMA)
 
         raise ParseException("json input ended without \"}\"")
 
-    def parse(self) -> Dict[str, str | float]:
+    def parse(self) -> Dict[str, str | int]:
+        self.advance()
         self.json()
 
         return self.result
 
 
-def main():
+# Parse with simdjson if it's installed. It finds the structure of the input
+# with SIMD instructions in native code, so it's orders of magnitude faster
+# than the lexer and parser above.
+#
+# It parses all of json though, which isn't quite the language we parse:
+# backslashes aren't escapes here, and there's no negative numbers, floats,
+# nesting and so on. So it only gets inputs it'd read the same way we do, and
+# its answer only counts if it's something our parser could have produced.
+# Otherwise this returns None and the input goes the slow way, which also
+# gets it our usual error messages.
+def fast_parse(json: str) -> Dict[str, str | int] | None:
+    if not HAS_SIMDJSON or "\\" in json or "-" in json:
+        return None
+
     try:
-        json = input()
+        result: Dict[str, str | int] = simdjson.loads(json)
+    except (ValueError, RuntimeError):
+        return None
 
-        lexer = Lexer(json)
+    if type(result) is not dict:
+        return None
 
-        try:
-            tokens = lexer.lex()
-        except LexException as e:
-            print(f"\033[31mlexer error:\033[0m {str(e)}", file=sys.stderr)
-            exit(1)
+    for value in result.values():
+        # bools are ints too, so check for the exact types
+        if type(value) is not str and type(value) is not int:
+            return None
 
-        parser = Parser(tokens)
+    return result
+
+
+def main() -> None:
+    try:
+        json = input()
 
-        try:
-            result = parser.parse()
-        except ParseException as e:
-            print(f"\033[31mparse error:\033[0m {str(e)}", file=sys.stderr)
-            exit(1)
+        # --pure skips simdjson and always uses our own parser
+        result = None
+        if "--pure" not in sys.argv[1:]:
+            result = fast_parse(json)
+
+        if result is None:
+            lexer = Lexer(json)
+            parser = Parser(lexer.tokens())
+
+            try:
+                result = parser.parse()
+            # These need different names, mypyc types a reused name by its
+            # first except clause and chokes on the second
+            except LexException as lex_error:
+                print(f"\033[31mlexer error:\033[0m {str(lex_error)}",
+                      file=sys.stderr)
+                sys.exit(1)
+            except ParseException as parse_error:
+                print(f"\033[31mparse error:\033[0m {str(parse_error)}",
+                      file=sys.stderr)
+                sys.exit(1)
 
         pprint(result)
     except KeyboardInterrupt: